@@ -1,11 +1,15 @@
 from fastmcp import FastMCP
 # from mcp.server.fastmcp import FastMCP
 import oracledb
-import random
-import string
+import functools
+import inspect
+import itertools
+import re
 import logging
 import os
 
+from cachetools import TTLCache
+
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -13,6 +17,39 @@ DWH_USERNAME = os.getenv("DWH_USERNAME")
 DWH_PASSWORD = os.getenv("DWH_PASSWORD")
 DSN = os.getenv("DSN")
 COST_THRESHOLD = int(os.getenv("COST_THRESHOLD", 100000))
+QUERY_LIMIT_SIZE = int(os.getenv("QUERY_LIMIT_SIZE", 100))
+CACHE_TTL_SECONDS = int(os.getenv("CACHE_TTL_SECONDS", 300))
+POOL_MIN = int(os.getenv("POOL_MIN", 2))
+POOL_MAX = int(os.getenv("POOL_MAX", 20))
+POOL_INCREMENT = int(os.getenv("POOL_INCREMENT", 2))
+STMT_CACHE_SIZE = int(os.getenv("STMT_CACHE_SIZE", 50))
+SDU = int(os.getenv("SDU", 65535))
+MCP_TRANSPORT = os.getenv("MCP_TRANSPORT", "streamable-http")  # stdio | sse | streamable-http
+FASTMCP_HOST = os.getenv("FASTMCP_HOST", "127.0.0.1")
+FASTMCP_PORT = int(os.getenv("FASTMCP_PORT", 8000))
+
+# Data dictionary queries can return thousands of rows; fetch them in as few
+# round-trips as possible (prefetchrows = arraysize + 1 avoids an extra trip)
+METADATA_ARRAYSIZE = 1000
+
+# Comments and whitespace in front of the first keyword of a statement
+LEADING_COMMENTS_PATTERN = re.compile(r"^(\s+|--[^\n]*|/\*.*?\*/)*", re.DOTALL)
+
+# Statements that can change what the metadata tools would return
+DDL_PATTERN = re.compile(
+    r"^(CREATE|ALTER|DROP|RENAME|TRUNCATE|COMMENT|GRANT|REVOKE|FLASHBACK|PURGE)\b",
+    re.IGNORECASE
+    )
+
+# Plain queries, the only statements whose pooled session is reused afterwards
+QUERY_PATTERN = re.compile(r"^(SELECT|WITH)\b", re.IGNORECASE)
+
+# Longest identifier Oracle accepts (since 12.2); anything longer can't match
+MAX_IDENTIFIER_LENGTH = 128
+
+# EXPLAIN PLAN statement ids; PLAN_TABLE rows are private to the session and
+# rolled back on release, so a per-process counter can't collide
+STATEMENT_IDS = itertools.count()
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(
@@ -22,10 +59,65 @@ logging.basicConfig(
     style="{"
     )
 
+# Shared session pool so tool calls reuse connections instead of paying the
+# connect + session bootstrap cost on every invocation. The asyncio pool must
+# be created inside the running event loop, so it is built on first use.
+# asyncio is only supported in thin mode; a larger SDU (network packet size,
+# capped by the server's own setting) cuts packets per large fetch instead.
+POOL = None
+
+
+def get_pool():
+    """
+    Return the shared asyncio connection pool, creating it on first use.
+    """
+    global POOL
+    if POOL is None:
+        POOL = oracledb.create_pool_async(
+            user=DWH_USERNAME,
+            password=DWH_PASSWORD,
+            dsn=DSN,
+            min=POOL_MIN,
+            max=POOL_MAX,
+            increment=POOL_INCREMENT,
+            getmode=oracledb.POOL_GETMODE_WAIT,
+            stmtcachesize=STMT_CACHE_SIZE,
+            sdu=SDU,
+            )
+    return POOL
+
+# Data dictionary results rarely change within a session, so metadata tools
+# keep their results for CACHE_TTL_SECONDS keyed by (tool, args)
+metadata_cache = TTLCache(maxsize=512, ttl=CACHE_TTL_SECONDS)
+
+
+def cache_metadata(func):
+    """
+    Cache successful results of a metadata tool in `metadata_cache`.
+    Error responses are never cached.
+    """
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        # Tools upper-case their arguments, so "hr" and "HR" share an entry
+        arguments = signature.bind(*args, **kwargs).arguments
+        key = (func.__name__, *(value.upper() for value in arguments.values()))
+        result = metadata_cache.get(key)
+        if result is not None:
+            return result
+
+        result = await func(*args, **kwargs)
+        if not (isinstance(result, dict) and "error" in result):
+            metadata_cache[key] = result
+        return result
+    return wrapper
+
+
 mcp = FastMCP("oracle_mcp_server")
 
 @mcp.tool(name="execute_sql", description="Executes an SQL query on the Oracle Database")
-def execute_sql(sqlString: str):
+async def execute_sql(sqlString: str):
     """
     Execute a SQL query against the Oracle database.
 
@@ -33,34 +125,63 @@ def execute_sql(sqlString: str):
         sqlString (str): The SQL query to execute
 
     Returns:
-        List[dict]: Query results as JSON (list of rows)
+        List[dict]: Query results as JSON (list of rows), or
+        dict: {"rows_affected": n} for DDL, which Oracle commits implicitly, or
+        dict: {"rows_affected": n, "committed": False} for DML and PL/SQL,
+        which are never committed and are rolled back when the call ends
     """
+    statement = LEADING_COMMENTS_PATTERN.sub("", sqlString, count=1)
     try:
-        with oracledb.connect(user=DWH_USERNAME, password=DWH_PASSWORD, dsn=DSN) as connection:
-            with connection.cursor() as cursor:
-                cursor.execute(sqlString)
-                rows = cursor.fetchmany()
-                headers = [col[0] for col in cursor.description]
-                return [dict(zip(headers, row)) for row in rows]
+        async with get_pool().acquire() as connection:
+            try:
+                with connection.cursor() as cursor:
+                    cursor.arraysize = QUERY_LIMIT_SIZE
+                    cursor.prefetchrows = QUERY_LIMIT_SIZE + 1
+                    await cursor.execute(sqlString)
+                    if DDL_PATTERN.match(statement):
+                        metadata_cache.clear()
+                    if cursor.description is None:
+                        if DDL_PATTERN.match(statement):
+                            return {"rows_affected": cursor.rowcount}
+                        return {"rows_affected": cursor.rowcount, "committed": False}
+                    headers = [col[0] for col in cursor.description]
+                    cursor.rowfactory = lambda *args: dict(zip(headers, args))
+                    # Build the result as rows arrive instead of holding the whole
+                    # fetch in a second list
+                    results = []
+                    async for row in cursor:
+                        results.append(row)
+                        if len(results) >= QUERY_LIMIT_SIZE:
+                            break
+                    return results
+            finally:
+                # Anything but a plain query may leave session state behind
+                # (ALTER SESSION, SET ROLE, package state from PL/SQL or
+                # triggers), so that session must not be handed to later calls
+                if not QUERY_PATTERN.match(statement):
+                    await get_pool().drop(connection)
     except Exception as e:
         # logger.exception(f"An unexpected error occurred: {e}")
         return {"error": str(e)}
 
 
-@mcp.tool(name="get_schemas", description="Retrieve a list of available schemas (users) in the database")
-def get_schemas():
+@mcp.tool(name="get_schemas", description="Retrieve a list of schemas that own at least one table visible to the current user")
+@cache_metadata
+async def get_schemas():
     """
-    Retrieve a list of available schemas (users) in the database.
+    Retrieve a list of schemas that own at least one table visible to the current user.
 
     Returns:
         List[dict]: Schemas as JSON
     """
-    query = "SELECT USERNAME FROM ALL_USERS ORDER BY USERNAME"
+    query = "SELECT OWNER FROM ALL_TABLES GROUP BY OWNER ORDER BY OWNER"
     try:
-        with oracledb.connect(user=DWH_USERNAME, password=DWH_PASSWORD, dsn=DSN) as connection:
+        async with get_pool().acquire() as connection:
             with connection.cursor() as cursor:
-                cursor.execute(query)
-                rows = cursor.fetchall()
+                cursor.arraysize = METADATA_ARRAYSIZE
+                cursor.prefetchrows = METADATA_ARRAYSIZE + 1
+                await cursor.execute(query)
+                rows = await cursor.fetchall()
                 return [{"schema": row[0]} for row in rows]
     except Exception as e:
         logger.exception(f"An unexpected error occurred: {e}")
@@ -68,7 +189,8 @@ def get_schemas():
 
 
 @mcp.tool(name="get_tables", description="Retrieve a list of table names for the given schema")
-def get_tables(schema: str):
+@cache_metadata
+async def get_tables(schema: str):
     """
     Retrieve a list of table names for the given schema.
 
@@ -79,15 +201,19 @@ def get_tables(schema: str):
         List[dict]: Table names as JSON
     """
     schema = schema.upper()
+    if not schema or len(schema) > MAX_IDENTIFIER_LENGTH:
+        return {"error": f"Invalid schema name: {schema}"}
     query = """
         SELECT TABLE_NAME FROM ALL_TABLES 
         WHERE OWNER = :schema
     """
     try:
-        with oracledb.connect(user=DWH_USERNAME, password=DWH_PASSWORD, dsn=DSN) as connection:
+        async with get_pool().acquire() as connection:
             with connection.cursor() as cursor:
-                cursor.execute(query, {"schema": schema})
-                rows = cursor.fetchall()
+                cursor.arraysize = METADATA_ARRAYSIZE
+                cursor.prefetchrows = METADATA_ARRAYSIZE + 1
+                await cursor.execute(query, {"schema": schema})
+                rows = await cursor.fetchall()
                 return [{"table_name": row[0]} for row in rows]
     except Exception as e:
         logger.exception(f"An unexpected error occurred: {e}")
@@ -95,7 +221,8 @@ def get_tables(schema: str):
 
 
 @mcp.tool(name="get_table_metadata", description="Retrieve column metadata for given schema and table")
-def get_table_metadata(schema: str, table_name: str):
+@cache_metadata
+async def get_table_metadata(schema: str, table_name: str):
     """
     Retrieve column metadata for a given table.
 
@@ -107,8 +234,12 @@ def get_table_metadata(schema: str, table_name: str):
         List[dict]: Column metadata as JSON
     """
     schema, table_name = schema.upper(), table_name.upper()
+    if not schema or len(schema) > MAX_IDENTIFIER_LENGTH:
+        return {"error": f"Invalid schema name: {schema}"}
+    if not table_name or len(table_name) > MAX_IDENTIFIER_LENGTH:
+        return {"error": f"Invalid table name: {table_name}"}
     query = """
-    SELECT 
+    SELECT /*+ FIRST_ROWS(50) */
         col.COLUMN_NAME,
         col.DATA_TYPE,
         col.DATA_LENGTH,
@@ -126,39 +257,51 @@ def get_table_metadata(schema: str, table_name: str):
         END AS IS_SUBPARTITION_KEY
     FROM 
         ALL_TAB_COLUMNS col
-    LEFT JOIN 
-        ALL_IND_COLUMNS idx
-        ON col.OWNER = idx.TABLE_OWNER
-        AND col.TABLE_NAME = idx.TABLE_NAME
-        AND col.COLUMN_NAME = idx.COLUMN_NAME
-    LEFT JOIN 
-        ALL_PART_KEY_COLUMNS part
-        ON col.OWNER = part.OWNER
-        AND col.TABLE_NAME = part.NAME
-        AND col.COLUMN_NAME = part.COLUMN_NAME
-    LEFT JOIN 
-        ALL_SUBPART_KEY_COLUMNS subpart
-        ON col.OWNER = subpart.OWNER
-        AND col.TABLE_NAME = subpart.NAME
-        AND col.COLUMN_NAME = subpart.COLUMN_NAME
+    LEFT JOIN (
+        SELECT DISTINCT COLUMN_NAME
+        FROM ALL_IND_COLUMNS
+        WHERE TABLE_OWNER = :schema
+        AND TABLE_NAME = :table_name
+    ) idx
+        ON col.COLUMN_NAME = idx.COLUMN_NAME
+    LEFT JOIN (
+        SELECT COLUMN_NAME
+        FROM ALL_PART_KEY_COLUMNS
+        WHERE OWNER = :schema
+        AND NAME = :table_name
+        AND OBJECT_TYPE = 'TABLE'
+    ) part
+        ON col.COLUMN_NAME = part.COLUMN_NAME
+    LEFT JOIN (
+        SELECT COLUMN_NAME
+        FROM ALL_SUBPART_KEY_COLUMNS
+        WHERE OWNER = :schema
+        AND NAME = :table_name
+        AND OBJECT_TYPE = 'TABLE'
+    ) subpart
+        ON col.COLUMN_NAME = subpart.COLUMN_NAME
     WHERE 
         col.OWNER = :schema
         AND col.TABLE_NAME = :table_name
+    ORDER BY 
+        col.COLUMN_ID
     """
     try:
-        with oracledb.connect(user=DWH_USERNAME, password=DWH_PASSWORD, dsn=DSN) as connection:
+        async with get_pool().acquire() as connection:
             with connection.cursor() as cursor:
-                cursor.execute(query, {"schema": schema, "table_name": table_name})
-                rows = cursor.fetchmany()
+                cursor.arraysize = METADATA_ARRAYSIZE
+                cursor.prefetchrows = METADATA_ARRAYSIZE + 1
+                await cursor.execute(query, {"schema": schema, "table_name": table_name})
                 headers = [col[0] for col in cursor.description]
-                return [dict(zip(headers, row)) for row in rows]
+                cursor.rowfactory = lambda *args: dict(zip(headers, args))
+                return await cursor.fetchall()
     except Exception as e:
         logger.exception(f"An unexpected error occurred: {e}")
         return {"error": str(e)}
     
 
 @mcp.tool(name="validate_and_estimate_cost", description="Validates an SQL query and returns its execution plan with cost.")
-def validate_and_estimate_cost(query: str):
+async def validate_and_estimate_cost(query: str):
     """
     Validates an SQL query, retrieves its execution plan, and prints the estimated cost.
 
@@ -168,24 +311,33 @@ def validate_and_estimate_cost(query: str):
     Returns:
         dict: Execution plan and cost as JSON
     """
-    statement_id = ''.join(random.choices(string.ascii_uppercase + string.digits, k=10))
+    statement_id = f"MCP{next(STATEMENT_IDS):07d}"
+    # EXPLAIN PLAN, plan display and cost lookup in a single round-trip
+    plan_block = """
+    BEGIN
+        EXECUTE IMMEDIATE 'EXPLAIN PLAN SET STATEMENT_ID = ''' || :statement_id || ''' FOR ' || :query;
+        OPEN :plan_cursor FOR
+            SELECT PLAN_TABLE_OUTPUT FROM TABLE(DBMS_XPLAN.DISPLAY(NULL, :statement_id, 'TYPICAL'));
+        SELECT COST INTO :cost FROM PLAN_TABLE WHERE STATEMENT_ID = :statement_id AND ID = 0;
+    END;
+    """
 
     try:
-        with oracledb.connect(user=DWH_USERNAME, password=DWH_PASSWORD, dsn=DSN) as connection:
-            with connection.cursor() as cursor:
-                cursor.execute(f"EXPLAIN PLAN SET STATEMENT_ID = '{statement_id}' FOR {query}")
-
-                cursor.execute(f"SELECT PLAN_TABLE_OUTPUT FROM TABLE(DBMS_XPLAN.DISPLAY(NULL, '{statement_id}', 'TYPICAL'))")
-                plan_output = [row[0] for row in cursor.fetchall()]
-
-                cursor.execute("""
-                    SELECT COST
-                    FROM PLAN_TABLE
-                    WHERE STATEMENT_ID = :statement_id AND ID = 0
-                """, {'statement_id': statement_id})
+        async with get_pool().acquire() as connection:
+            with connection.cursor() as cursor, connection.cursor() as plan_cursor:
+                plan_cursor.arraysize = METADATA_ARRAYSIZE
+                plan_cursor.prefetchrows = METADATA_ARRAYSIZE + 1
+                cost_var = cursor.var(oracledb.DB_TYPE_NUMBER)
+                await cursor.execute(plan_block, {
+                    'statement_id': statement_id,
+                    'query': query,
+                    'plan_cursor': plan_cursor,
+                    'cost': cost_var
+                    })
+                plan_output = [row[0] for row in await plan_cursor.fetchall()]
 
-                cost_result = cursor.fetchone()
-                cost = int(cost_result[0]) if cost_result and cost_result[0] is not None else 0
+                cost_result = cost_var.getvalue()
+                cost = int(cost_result) if cost_result is not None else 0
 
                 if cost > COST_THRESHOLD:
                     logger.warning(f"The estimated cost of this query is {cost}, which may impact database performance.")
@@ -201,4 +353,7 @@ def validate_and_estimate_cost(query: str):
 
         
 if __name__ == "__main__":
-    mcp.run()
+    if MCP_TRANSPORT == "stdio":
+        mcp.run(transport="stdio")
+    else:
+        mcp.run(transport=MCP_TRANSPORT, host=FASTMCP_HOST, port=FASTMCP_PORT)